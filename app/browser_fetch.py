@@ -1,40 +1,225 @@
 from __future__ import annotations
-import asyncio, os, re, contextlib
-from typing import Optional, Dict, Any, Tuple
+import asyncio, os, re, time, contextlib
+from types import MappingProxyType
+from typing import Optional, Dict, Any, List, Tuple, FrozenSet, Iterable, Mapping
 from urllib.parse import urlsplit, urlunsplit
 
-from playwright.async_api import async_playwright, Browser, BrowserContext, Page
+from playwright.async_api import async_playwright, Browser, BrowserContext, Page, Route
 
 CONCURRENCY = int(os.environ.get("CONCURRENCY", "4"))
 PAGE_TIMEOUT_MS = int(os.environ.get("PAGE_TIMEOUT_MS", "35000"))
+# Backpressure: fetches allowed to queue for a slot, and how long they may wait
+MAX_QUEUE = int(os.environ.get("MAX_QUEUE", str(CONCURRENCY * 4)))
+QUEUE_TIMEOUT_MS = int(os.environ.get("QUEUE_TIMEOUT_MS", "5000"))
+# CDP endpoint of a shared Chromium (see browser_server.py); unset -> launch in-process
+PLAYWRIGHT_WS = os.environ.get("PLAYWRIGHT_WS", "")
+# Playwright 1.47 already passes its own --disable-features list (chromiumSwitches.js) and
+# Chromium keeps only the last value of a repeated switch, so ours repeats Playwright's list
+# and adds site-per-process. Keep in sync with the pinned playwright version.
+_PLAYWRIGHT_DISABLED_FEATURES = (
+    "ImprovedCookieControls,LazyFrameLoading,GlobalMediaControls,DestroyProfileOnBrowserClose,"
+    "MediaRouter,DialMediaRouteProvider,AcceptCHFrame,AutoExpandDetailsElement,"
+    "CertificateTransparencyComponentUpdater,AvoidUnnecessaryBeforeUnloadCheckSync,"
+    "Translate,HttpsUpgrades,PaintHolding,PlzDedicatedWorker"
+)
+# Pure DOM scraping: no GPU, no site-isolation subprocesses, capped V8 heap
+CHROMIUM_ARGS = [
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-gpu",
+    "--disable-extensions",
+    f"--disable-features={_PLAYWRIGHT_DISABLED_FEATURES},site-per-process",
+    "--disable-sync",
+    "--js-flags=--max-old-space-size=256",
+]
+# Idle pages are parked on about:blank and reused; recycle each after this many fetches
+PAGE_MAX_USES = int(os.environ.get("PAGE_MAX_USES", "50"))
+PREWARM_PAGES = int(os.environ.get("PREWARM_PAGES", str(CONCURRENCY)))
+# Post-navigation settle: stop as soon as main content or the load event shows up
+SETTLE_TIMEOUT_MS = int(os.environ.get("SETTLE_TIMEOUT_MS", "2500"))
+# How long a learned settle strategy is trusted before both signals are raced again
+SETTLE_STRATEGY_TTL_S = float(os.environ.get("SETTLE_STRATEGY_TTL_S", "600"))
+READY_SELECTOR = "main, article, #content, .content"
+# Skip optional extras (perf timings) to keep each fetch as lean as possible
+FAST_SCAN = os.environ.get("FAST_SCAN", "0").lower() in ("1", "true", "yes")
+
+_SNAPSHOT_JS = """(withPerf) => {
+  const doctype = document.doctype ? new XMLSerializer().serializeToString(document.doctype) : "";
+  let perf = null;
+  if (withPerf) {
+    const t = performance.timing || {};
+    perf = {
+      domInteractive: (t.domInteractive||0) - (t.navigationStart||0),
+      domComplete: (t.domComplete||0) - (t.navigationStart||0)
+    };
+  }
+  return {html: doctype + (document.documentElement ? document.documentElement.outerHTML : ""), perf};
+}"""
+
+# Only the DOM is analyzed, so skip heavy subresources and ad/analytics beacons.
+# Tag managers are left alone since they may inject SEO tags.
+BLOCKED_RESOURCE_TYPES: FrozenSet[str] = frozenset({"image", "media", "font", "stylesheet"})
+BLOCKED_HOSTS: Tuple[str, ...] = (
+    "doubleclick.net",
+    "googlesyndication.com",
+    "google-analytics.com",
+    "adservice.google.com",
+    "facebook.net",
+    "scorecardresearch.com",
+    "hotjar.com",
+)
+
+def _is_blocked_host(url: str) -> bool:
+    host = urlsplit(url).hostname or ""
+    return any(host == h or host.endswith("." + h) for h in BLOCKED_HOSTS)
+
+def _router(blocked: FrozenSet[str]):
+    async def handle(route: Route) -> None:
+        request = route.request
+        if request.resource_type in blocked or _is_blocked_host(request.url):
+            await route.abort()
+        else:
+            await route.continue_()
+    return handle
+
+# Per host, which settle signal fired first last time ("selector"/"load"), or "none" when
+# neither did; later fetches wait only for that signal (or not at all) until the entry is
+# SETTLE_STRATEGY_TTL_S old. Values are (strategy, learned_at monotonic). FIFO-bounded.
+_SETTLE_STRATEGY: Dict[str, Tuple[str, float]] = {}
+MAX_SETTLE_HOSTS = 2048
+
+def _remember_strategy(host: str, strategy: Optional[str]) -> None:
+    _SETTLE_STRATEGY.pop(host, None)
+    if strategy is None:
+        return
+    if len(_SETTLE_STRATEGY) >= MAX_SETTLE_HOSTS:
+        _SETTLE_STRATEGY.pop(next(iter(_SETTLE_STRATEGY)))
+    _SETTLE_STRATEGY[host] = (strategy, time.monotonic())
+
+async def _settle(page: Page, timeout_ms: int, host: str="") -> None:
+    strategy: Optional[str] = None
+    entry = _SETTLE_STRATEGY.get(host)
+    # Expired entries fall back to racing both, so one slow fetch doesn't pin a host to "none"
+    if entry is not None and time.monotonic() - entry[1] < SETTLE_STRATEGY_TTL_S:
+        strategy = entry[0]
+    if strategy == "none":
+        return
+    waits: Dict[asyncio.Task, str] = {}
+    if strategy in (None, "selector"):
+        waits[asyncio.create_task(page.wait_for_selector(READY_SELECTOR, timeout=timeout_ms))] = "selector"
+    if strategy in (None, "load"):
+        waits[asyncio.create_task(page.wait_for_load_state("load", timeout=timeout_ms))] = "load"
+    pending = set(waits)
+    winner: Optional[str] = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            # A wait that errored (e.g. timed out) doesn't count as settled
+            ok = [t for t in done if t.exception() is None]
+            if ok:
+                winner = waits[ok[0]]
+                break
+    finally:
+        for t in pending:
+            t.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    if strategy is None:
+        _remember_strategy(host, winner or "none")
+    elif winner is None:
+        # The learned signal stopped working for this host; race both again next time
+        _remember_strategy(host, None)
+
+# new_context kwargs per device, built once; idle tabs are keyed by (user_agent, width, height)
+def _device_profile(mobile: bool) -> Mapping[str, Any]:
+    return MappingProxyType({
+        "user_agent": (
+            "Mozilla/5.0 (Linux; Android 12; Pixel 6) AppleWebKit/537.36 "
+            "(KHTML, like Gecko) Chrome/128.0.0.0 Mobile Safari/537.36"
+            if mobile else
+            "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+            "(KHTML, like Gecko) Chrome/128.0.0.0 Safari/537.36"
+        ),
+        "viewport": {"width": 390, "height": 844} if mobile else {"width": 1366, "height": 800},
+        "device_scale_factor": 3 if mobile else 1,
+        "is_mobile": mobile,
+        "has_touch": mobile,
+        "java_script_enabled": True,
+        "ignore_https_errors": True,
+        # Pooled contexts outlive a scan: a worker from an earlier visit could serve stale HTML
+        # from its cache, and page.route() never sees requests a service worker answers
+        "service_workers": "block",
+    })
+
+_DEVICE_PROFILES: Dict[bool, Mapping[str, Any]] = {m: _device_profile(m) for m in (False, True)}
+_PROFILE_KEYS: Dict[bool, Tuple[str, int, int]] = {
+    m: (p["user_agent"], p["viewport"]["width"], p["viewport"]["height"])
+    for m, p in _DEVICE_PROFILES.items()
+}
+
+class PoolOverloaded(RuntimeError):
+    """Raised when no render slot is available within the queue limits."""
+
+# Per-tab state a reused page would otherwise carry into the next scan of the same site
+_RESET_TAB_JS = """
+() => {
+  try { sessionStorage.clear(); } catch (e) {}
+  try { localStorage.clear(); } catch (e) {}
+  window.name = "";
+}
+"""
+
+async def _close_stray_page(page: Page) -> None:
+    with contextlib.suppress(Exception):
+        await page.close()
+
+class _Tab:
+    """Bookkeeping for a pooled page and the context it owns."""
+    __slots__ = ("context", "key", "uses", "blocked")
+
+    def __init__(self, context: BrowserContext, key: Tuple[str, int, int]) -> None:
+        self.context = context
+        self.key = key
+        self.uses = 0
+        self.blocked: FrozenSet[str] = frozenset()
 
 class PlaywrightPool:
     def __init__(self) -> None:
         self._playwright = None
         self._browser: Optional[Browser] = None
         self._sema = asyncio.Semaphore(CONCURRENCY)
+        self._waiters = 0
         self._lock = asyncio.Lock()
         self._ready = asyncio.Event()
+        self._idle: Dict[Tuple[str, int, int], List[Page]] = {}
+        self._tabs: Dict[Page, _Tab] = {}
 
     async def start(self) -> None:
+        # Double-checked: once started, skip the lock entirely
+        if self._ready.is_set():
+            return
         async with self._lock:
             if self._browser:
                 self._ready.set()
                 return
             self._playwright = await async_playwright().start()
-            self._browser = await self._playwright.chromium.launch(
-                headless=True,
-                args=[
-                    "--no-sandbox",
-                    "--disable-dev-shm-usage",
-                    "--disable-gpu",
-                    "--disable-extensions",
-                ],
-            )
+            if PLAYWRIGHT_WS:
+                # Workers share one browser; close() only disconnects from it
+                self._browser = await self._playwright.chromium.connect_over_cdp(PLAYWRIGHT_WS)
+            else:
+                self._browser = await self._playwright.chromium.launch(
+                    headless=True,
+                    args=CHROMIUM_ARGS,
+                )
+            await self._prewarm(PREWARM_PAGES)
             self._ready.set()
 
     async def close(self) -> None:
         async with self._lock:
+            for tab in self._tabs.values():
+                with contextlib.suppress(Exception):
+                    await tab.context.close()
+            self._idle.clear()
+            self._tabs.clear()
             with contextlib.suppress(Exception):
                 if self._browser:
                     await self._browser.close()
@@ -45,63 +230,133 @@ class PlaywrightPool:
             self._playwright = None
             self._ready.clear()
 
-    async def get_page(self, mobile: bool=False) -> Tuple[BrowserContext, Page]:
-        await self._ready.wait()
+    async def _new_tab(self, mobile: bool=False) -> Page:
+        # Each tab owns its context, so concurrent scans never share cookies or storage
         assert self._browser is not None
-        context = await self._browser.new_context(
-            user_agent=(
-                "Mozilla/5.0 (Linux; Android 12; Pixel 6) AppleWebKit/537.36 "
-                "(KHTML, like Gecko) Chrome/128.0.0.0 Mobile Safari/537.36"
-                if mobile else
-                "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
-                "(KHTML, like Gecko) Chrome/128.0.0.0 Safari/537.36"
-            ),
-            viewport={"width": 390, "height": 844} if mobile else {"width": 1366, "height": 800},
-            device_scale_factor=3 if mobile else 1,
-            is_mobile=mobile,
-            has_touch=mobile,
-            java_script_enabled=True,
-            ignore_https_errors=True,
-        )
-        page = await context.new_page()
+        context = await self._browser.new_context(**_DEVICE_PROFILES[bool(mobile)])
+        try:
+            page = await context.new_page()
+        except Exception:
+            with contextlib.suppress(Exception):
+                await context.close()
+            raise
+        # Registered after new_page(), so every later page is one the site opened. Playwright
+        # launches Chromium with --disable-popup-blocking; popunders must not pile up and run.
+        context.on("page", _close_stray_page)
         page.set_default_timeout(PAGE_TIMEOUT_MS)
-        return context, page
+        self._tabs[page] = _Tab(context, _PROFILE_KEYS[bool(mobile)])
+        return page
+
+    async def _retire_tab(self, page: Page) -> None:
+        tab = self._tabs.pop(page, None)
+        with contextlib.suppress(Exception):
+            if tab is not None:
+                await tab.context.close()
+            else:
+                await page.close()
+
+    async def _prewarm(self, count: int) -> None:
+        # Desktop is the default scan profile; mobile tabs are created on first use
+        idle = self._idle.setdefault(_PROFILE_KEYS[False], [])
+        for _ in range(count):
+            with contextlib.suppress(Exception):
+                idle.append(await self._new_tab(mobile=False))
+
+    async def acquire_page(self, mobile: bool=False, block_resources: Optional[Iterable[str]]=None) -> Page:
+        if not self._ready.is_set():
+            await self._ready.wait()
+        page: Optional[Page] = None
+        idle = self._idle.get(_PROFILE_KEYS[bool(mobile)])
+        while idle and page is None:
+            candidate = idle.pop()
+            if candidate.is_closed():
+                await self._retire_tab(candidate)
+            else:
+                page = candidate
+        if page is None:
+            page = await self._new_tab(mobile=mobile)
+        tab = self._tabs[page]
+        tab.uses += 1
+        # None -> default block list; an empty set (e.g. for screenshots) disables routing.
+        # Routes stay installed on idle tabs, so only a change of block list costs a round-trip.
+        blocked = BLOCKED_RESOURCE_TYPES if block_resources is None else frozenset(block_resources)
+        if blocked != tab.blocked:
+            try:
+                if tab.blocked:
+                    await page.unroute("**/*")
+                if blocked:
+                    await page.route("**/*", _router(blocked))
+            except BaseException:
+                # The caller never gets the page, so release_page won't run; don't leak its context
+                await self._retire_tab(page)
+                raise
+            tab.blocked = blocked
+        return page
+
+    async def release_page(self, page: Page) -> None:
+        tab = self._tabs.get(page)
+        reuse = (
+            tab is not None
+            and tab.uses < PAGE_MAX_USES
+            and not page.is_closed()
+            and len(self._idle.get(tab.key, ())) < CONCURRENCY
+        )
+        if reuse:
+            try:
+                # Runs on the scanned origin: storage is per origin and window.name survives navigation
+                await page.evaluate(_RESET_TAB_JS)
+                # Drops the previous document (timers, sockets, memory) before parking the tab
+                await page.goto("about:blank", timeout=5000)
+                # Consent walls, paywall meters and A/B cookies must not leak into the next scan
+                await tab.context.clear_cookies()
+            except Exception:
+                reuse = False
+        if reuse:
+            self._idle.setdefault(tab.key, []).append(page)
+            return
+        await self._retire_tab(page)
+
+    async def _acquire_slot(self) -> None:
+        # Shed load instead of letting an unbounded queue pile up on the semaphore
+        if self._waiters >= MAX_QUEUE:
+            raise PoolOverloaded("Too many scans in progress, try again shortly")
+        self._waiters += 1
+        try:
+            await asyncio.wait_for(self._sema.acquire(), timeout=QUEUE_TIMEOUT_MS / 1000)
+        except asyncio.TimeoutError:
+            raise PoolOverloaded("Timed out waiting for a free browser slot") from None
+        finally:
+            self._waiters -= 1
 
-    async def fetch(self, url: str, mobile: bool=False, max_wait_ms: Optional[int]=None) -> Dict[str, Any]:
+    async def fetch(
+        self,
+        url: str,
+        mobile: bool=False,
+        max_wait_ms: Optional[int]=None,
+        block_resources: Optional[Iterable[str]]=None,
+    ) -> Dict[str, Any]:
         timeout = max_wait_ms or PAGE_TIMEOUT_MS
-        await self._sema.acquire()
+        await self._acquire_slot()
         try:
-            context, page = await self.get_page(mobile=mobile)
+            page = await self.acquire_page(mobile=mobile, block_resources=block_resources)
             try:
                 resp = await page.goto(url, wait_until="domcontentloaded", timeout=timeout)
-                # Wait for network to settle—helps with SPA/lazy content
-                with contextlib.suppress(Exception):
-                    await page.wait_for_load_state("networkidle", timeout=int(timeout*0.6))
+                # networkidle never fires on pages with ad long-polls; use a bounded race instead
+                await _settle(page, min(SETTLE_TIMEOUT_MS, timeout), urlsplit(page.url).netloc.lower())
 
                 final_url = page.url
                 status = resp.status if resp else None
-                html = await page.content()
-
-                # Extract performance timings if available
-                perf = await page.evaluate("""() => {
-                  const t = performance.timing || {};
-                  return {
-                    domInteractive: (t.domInteractive||0) - (t.navigationStart||0),
-                    domComplete: (t.domComplete||0) - (t.navigationStart||0)
-                  }
-                }""")
+                # One CDP round-trip for the DOM and (unless FAST_SCAN) perf timings
+                result = await page.evaluate(_SNAPSHOT_JS, not FAST_SCAN)
 
                 return {
                     "final_url": final_url,
                     "status": status,
-                    "html": html,
-                    "perf": perf,
+                    "html": result["html"],
+                    "perf": result["perf"] or {},
                 }
             finally:
-                with contextlib.suppress(Exception):
-                    await page.close()
-                with contextlib.suppress(Exception):
-                    await context.close()
+                await self.release_page(page)
         finally:
             self._sema.release()
 
@@ -114,9 +369,14 @@ async def get_pool() -> PlaywrightPool:
         await _pool.start()
     return _pool
 
-async def fetch_rendered(url: str, mobile: bool=False, max_wait_ms: Optional[int]=None) -> Dict[str, Any]:
+async def fetch_rendered(
+    url: str,
+    mobile: bool=False,
+    max_wait_ms: Optional[int]=None,
+    block_resources: Optional[Iterable[str]]=None,
+) -> Dict[str, Any]:
     pool = await get_pool()
-    return await pool.fetch(url, mobile=mobile, max_wait_ms=max_wait_ms)
+    return await pool.fetch(url, mobile=mobile, max_wait_ms=max_wait_ms, block_resources=block_resources)
 
 async def shutdown_pool() -> None:
     global _pool
@@ -0,0 +1,24 @@
+from __future__ import annotations
+import asyncio, os
+
+from playwright.async_api import async_playwright
+
+from .browser_fetch import CHROMIUM_ARGS
+
+# Run once per host (`python -m app.browser_server`) and point every worker at it
+# with PLAYWRIGHT_WS, so they share one Chromium instead of launching their own.
+CDP_PORT = int(os.environ.get("CDP_PORT", "9222"))
+
+async def main() -> None:
+    async with async_playwright() as pw:
+        browser = await pw.chromium.launch(
+            headless=True,
+            args=[*CHROMIUM_ARGS, f"--remote-debugging-port={CDP_PORT}"],
+        )
+        closed = asyncio.Event()
+        browser.on("disconnected", lambda _: closed.set())
+        print(f"PLAYWRIGHT_WS=http://127.0.0.1:{CDP_PORT}", flush=True)
+        await closed.wait()
+
+if __name__ == "__main__":
+    asyncio.run(main())
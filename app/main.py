@@ -1,24 +1,155 @@
 from __future__ import annotations
-import os, asyncio, time
-from typing import Optional
+import os, asyncio, re, time
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import Optional, Dict, Any, Tuple
 from contextlib import asynccontextmanager
+from urllib.parse import urlsplit, urlunsplit
 
 from fastapi import FastAPI, Request, Form
 from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel, HttpUrl
 
-from .browser_fetch import fetch_rendered, get_pool, shutdown_pool
+from .browser_fetch import fetch_rendered, get_pool, shutdown_pool, PoolOverloaded
 from .seo import parse_seo
 
 templates = Jinja2Templates(directory="app/templates")
 
+# HTML parsing is CPU-bound; run it in worker processes so the event loop keeps serving I/O.
+# PARSE_WORKERS=0 parses inline on the event loop instead.
+PARSE_WORKERS = int(os.environ.get("PARSE_WORKERS", str(os.cpu_count() or 1)))
+PARSE_EXEC: Optional[ProcessPoolExecutor] = None
+
+def _new_parse_exec() -> ProcessPoolExecutor:
+    # spawn, not fork: the parent runs Playwright's driver and event-loop threads
+    return ProcessPoolExecutor(
+        max_workers=PARSE_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+async def _parse(html: str, final_url: str) -> Dict[str, Any]:
+    global PARSE_EXEC
+    for attempt in range(2):
+        executor = PARSE_EXEC
+        if executor is None:
+            return parse_seo(html, final_url)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, parse_seo, html, final_url)
+        except BrokenProcessPool:
+            # A dead worker (OOM kill, parser crash) breaks the pool for good; swap in a fresh
+            # one, unless a concurrent scan already did. Retry there, not inline: a page that
+            # crashes the parser would take the server down with it.
+            if PARSE_EXEC is executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+                PARSE_EXEC = _new_parse_exec()
+            if attempt:
+                raise
+
+# Finished scans, keyed by (normalized url, mobile); LRU-evicted past ANALYZE_CACHE_MAX
+ANALYZE_CACHE_TTL = int(os.environ.get("ANALYZE_CACHE_TTL", "300"))
+ANALYZE_CACHE_MAX = int(os.environ.get("ANALYZE_CACHE_MAX", "512"))
+ANALYZE_CACHE: OrderedDict[Tuple[str, bool], Tuple[float, Dict[str, Any]]] = OrderedDict()
+
+# Already-normalized urls (lowercase host, explicit path, no fragment) pass through as-is
+_CANON_URL = re.compile(r"https?://[a-z0-9.-]+/[^#\s]*(?<!\?)")
+
+@lru_cache(maxsize=4096)
+def _norm_url(url: str) -> str:
+    if _CANON_URL.fullmatch(url):
+        return url
+    parts = urlsplit(url.strip())
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", parts.query, ""))
+
+def _cache_get(key: Tuple[str, bool]) -> Optional[Dict[str, Any]]:
+    hit = ANALYZE_CACHE.get(key)
+    if hit is None:
+        return None
+    stored_at, out = hit
+    if time.time() - stored_at > ANALYZE_CACHE_TTL:
+        ANALYZE_CACHE.pop(key, None)
+        return None
+    ANALYZE_CACHE.move_to_end(key)
+    return out
+
+def _cache_put(key: Tuple[str, bool], out: Dict[str, Any]) -> None:
+    ANALYZE_CACHE[key] = (time.time(), out)
+    ANALYZE_CACHE.move_to_end(key)
+    while len(ANALYZE_CACHE) > ANALYZE_CACHE_MAX:
+        ANALYZE_CACHE.popitem(last=False)
+
+def _cache_sweep() -> None:
+    cutoff = time.time() - ANALYZE_CACHE_TTL
+    for key in [k for k, (stored_at, _) in ANALYZE_CACHE.items() if stored_at < cutoff]:
+        ANALYZE_CACHE.pop(key, None)
+
+async def _cache_sweeper(interval_s: float = 60) -> None:
+    # Expired entries are otherwise only dropped when their key is requested again
+    while True:
+        await asyncio.sleep(interval_s)
+        _cache_sweep()
+
+async def _scan(url: str, mobile: bool, max_wait_ms: Optional[int]) -> Dict[str, Any]:
+    t0 = time.time()
+    rendered = await fetch_rendered(url, mobile=mobile, max_wait_ms=max_wait_ms)
+    html = rendered.get("html", "")
+    final_url = rendered.get("final_url", url)
+    status = rendered.get("status")
+    perf = rendered.get("perf", {})
+
+    seo = await _parse(html, final_url)
+
+    return {
+        "input_url": url,
+        "final_url": final_url,
+        "http_status": status,
+        "timing_ms": int((time.time() - t0) * 1000),
+        "perf": perf,
+        **seo,
+    }
+
+# Scans currently rendering; concurrent requests for the same key await the same future
+_INFLIGHT: Dict[Tuple[str, bool], asyncio.Future] = {}
+
+async def _scan_shared(key: Tuple[str, bool], url: str, mobile: bool, max_wait_ms: Optional[int]) -> Dict[str, Any]:
+    fut = _INFLIGHT.get(key)
+    if fut is not None:
+        # shield: one waiter disconnecting must not cancel the render for the others
+        return await asyncio.shield(fut)
+    fut = asyncio.get_running_loop().create_future()
+    _INFLIGHT[key] = fut
+    try:
+        out = await _scan(url, mobile, max_wait_ms)
+        fut.set_result(out)
+        _cache_put(key, out)
+        return out
+    except Exception as e:
+        fut.set_exception(e)
+        raise
+    finally:
+        if not fut.done():
+            fut.set_exception(RuntimeError("Scan cancelled"))
+        # Retrieve the error so a future nobody else awaited doesn't get logged
+        fut.exception()
+        _INFLIGHT.pop(key, None)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    global PARSE_EXEC
+    if PARSE_WORKERS > 0:
+        PARSE_EXEC = _new_parse_exec()
     # Warm up Playwright
     await get_pool()
+    sweeper = asyncio.create_task(_cache_sweeper())
     yield
+    sweeper.cancel()
     await shutdown_pool()
+    if PARSE_EXEC is not None:
+        PARSE_EXEC.shutdown(wait=False, cancel_futures=True)
+        PARSE_EXEC = None
 
 app = FastAPI(title="SEO Scanner (Playwright)", lifespan=lifespan)
 
@@ -47,25 +178,22 @@ async def analyze(
             max_wait_ms = data.get("max_wait_ms")
         except Exception:
             return JSONResponse({"error": "Missing url"}, status_code=400)
+        if not url:
+            return JSONResponse({"error": "Missing url"}, status_code=400)
+        if not isinstance(url, str):
+            return JSONResponse({"error": "url must be a string"}, status_code=400)
+
+    key = (_norm_url(url), bool(mobile))
+    if request.query_params.get("nocache") != "1":
+        cached = _cache_get(key)
+        if cached is not None:
+            return JSONResponse({**cached, "input_url": url, "cached": True})
 
-    t0 = time.time()
     try:
-        rendered = await fetch_rendered(url, mobile=bool(mobile), max_wait_ms=max_wait_ms)
-        html = rendered.get("html", "")
-        final_url = rendered.get("final_url", url)
-        status = rendered.get("status")
-        perf = rendered.get("perf", {})
-
-        seo = parse_seo(html, final_url)
-
-        out = {
-            "input_url": url,
-            "final_url": final_url,
-            "http_status": status,
-            "timing_ms": int((time.time() - t0) * 1000),
-            "perf": perf,
-            **seo,
-        }
-        return JSONResponse(out)
+        out = await _scan_shared(key, url, bool(mobile), max_wait_ms)
+        # Coalesced/cached results may come from an equivalent spelling of the url
+        return JSONResponse({**out, "input_url": url})
+    except PoolOverloaded as e:
+        return JSONResponse({"error": str(e)}, status_code=503, headers={"Retry-After": "5"})
     except Exception as e:
         return JSONResponse({"error": str(e)}, status_code=500)
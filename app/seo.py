@@ -1,8 +1,10 @@
 from __future__ import annotations
-from typing import Dict, Any, List
-from selectolax.parser import HTMLParser
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
+import json
+from functools import lru_cache
+from typing import Dict, Any, List, Iterable
+import orjson
+from selectolax.lexbor import LexborHTMLParser
+from urllib.parse import urljoin, urlsplit
 
 def _text(node):
     if not node:
@@ -10,89 +12,125 @@ def _text(node):
     t = node.text().strip()
     return t or None
 
+def _collect_types(obj, out: List[str]) -> None:
+    # Explicit stack: no per-node call overhead. Depth is capped by the decoder, not here:
+    # orjson rejects >1024 levels and the json fallback then raises RecursionError
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, dict):
+            t = obj.get("@type")
+            if t:
+                if isinstance(t, list):
+                    out.extend([str(x) for x in t])
+                else:
+                    out.append(str(t))
+            stack.extend(obj.values())
+        elif isinstance(obj, list):
+            stack.extend(obj)
+
+def _json_loads(blob: str) -> Any:
+    try:
+        return orjson.loads(blob)
+    except orjson.JSONDecodeError:
+        # orjson is strict (no NaN/Infinity, 64-bit ints); keep the stdlib's leniency
+        return json.loads(blob)
+
+def _schema_types(blobs: Iterable[str]) -> List[str]:
+    schema_types: List[str] = []
+    for blob in blobs:
+        try:
+            _collect_types(_json_loads(blob), schema_types)
+        except Exception:
+            continue
+    return schema_types
+
+@lru_cache(maxsize=4096)
+def _host(url: str) -> str:
+    # Keyed by full URL, so only links that recur (nav/footer, across pages in one worker)
+    # hit; urlsplit's own cache holds just 128 entries. Unique article links always miss.
+    return urlsplit(url).netloc
+
+def _join(base_url: str, href: str) -> str:
+    # Absolute links (the common case) don't need urljoin to re-parse the base every time
+    if href.startswith(("http://", "https://")):
+        return href
+    return urljoin(base_url, href)
+
+_SCAN_SELECTOR = 'a, h1, h2, h3, meta, link, script[type="application/ld+json" i], title'
+
 def parse_seo(html: str, base_url: str) -> Dict[str, Any]:
-    tree = HTMLParser(html)
-    soup = BeautifulSoup(html, "lxml")
+    tree = LexborHTMLParser(html)
 
-    # Title
     title = None
-    node_t = tree.css_first("title")
-    if node_t:
-        title = node_t.text().strip()
-
-    # Meta
     meta_desc = ""
     meta_robots = ""
     meta_viewport = ""
-    for m in soup.find_all("meta"):
-        name = (m.get("name") or m.get("property") or "").lower()
-        if name == "description":
-            meta_desc = (m.get("content") or "").strip()
-        if name == "robots":
-            meta_robots = (m.get("content") or "").strip()
-        if name == "viewport":
-            meta_viewport = (m.get("content") or "").strip()
-
-    # Canonical & hreflang
     canonical = None
     hreflangs = []
-    for link in soup.find_all("link"):
-        rel = (link.get("rel") or [""])[0].lower() if link.get("rel") else (link.get("rel") or "")
-        if rel == "canonical":
-            canonical = (link.get("href") or "").strip()
-        if (link.get("rel") or [""])[0].lower() == "alternate" and link.get("hreflang"):
-            hreflangs.append({
-                "lang": link.get("hreflang"),
-                "href": link.get("href")
-            })
-
-    # Headings
-    headings = {
-        "h1": [h.get_text(strip=True) for h in soup.find_all("h1")],
-        "h2": [h.get_text(strip=True) for h in soup.find_all("h2")],
-        "h3": [h.get_text(strip=True) for h in soup.find_all("h3")],
-    }
-
-    # Links
-    a_tags = soup.find_all("a")
+    headings: Dict[str, List[str]] = {"h1": [], "h2": [], "h3": []}
     internal = external = nofollow = 0
-    parsed_base = urlparse(base_url)
-    for a in a_tags:
-        href = (a.get("href") or "").strip()
-        if not href or href.startswith("#"):
-            continue
-        rel = (a.get("rel") or []) or []
-        full = urljoin(base_url, href)
-        parsed = urlparse(full)
-        if "nofollow" in [r.lower() for r in rel]:
-            nofollow += 1
-        if parsed.netloc == parsed_base.netloc:
-            internal += 1
-        else:
-            external += 1
+    base_netloc = _host(base_url)
+    ld_json: List[str] = []
+
+    # Lexbor matches the whole selector list in a single document-order walk, so "first
+    # title" and "last meta wins" follow the page order; the selectors never overlap
+    for node in tree.css(_SCAN_SELECTOR):
+        tag = node.tag
+
+        # Links
+        if tag == "a":
+            attrs = node.attributes
+            href = (attrs.get("href") or "").strip()
+            if not href or href.startswith("#"):
+                continue
+            rel = (attrs.get("rel") or "").lower().split()
+            full = _join(base_url, href)
+            if "nofollow" in rel:
+                nofollow += 1
+            if _host(full) == base_netloc:
+                internal += 1
+            else:
+                external += 1
+
+        # Headings
+        elif tag in headings:
+            headings[tag].append(node.text(strip=True))
+
+        # Meta
+        elif tag == "meta":
+            attrs = node.attributes
+            name = (attrs.get("name") or attrs.get("property") or "").lower()
+            if name == "description":
+                meta_desc = (attrs.get("content") or "").strip()
+            if name == "robots":
+                meta_robots = (attrs.get("content") or "").strip()
+            if name == "viewport":
+                meta_viewport = (attrs.get("content") or "").strip()
+
+        # Canonical & hreflang
+        elif tag == "link":
+            attrs = node.attributes
+            # rel is a token list ("alternate canonical" is both)
+            rels = {r.lower() for r in (attrs.get("rel") or "").split()}
+            if "canonical" in rels:
+                canonical = (attrs.get("href") or "").strip()
+            if "alternate" in rels and attrs.get("hreflang"):
+                hreflangs.append({
+                    "lang": attrs.get("hreflang"),
+                    "href": attrs.get("href")
+                })
+
+        # JSON-LD blobs
+        elif tag == "script":
+            ld_json.append(node.text())
+
+        # Title (first one wins)
+        elif tag == "title" and title is None:
+            title = node.text().strip()
 
     # JSON-LD types
-    schema_types: List[str] = []
-    for tag in soup.find_all("script", {"type": "application/ld+json"}):
-        try:
-            import json
-            data = json.loads(tag.text)
-            def collect_types(obj):
-                if isinstance(obj, dict):
-                    t = obj.get("@type")
-                    if t:
-                        if isinstance(t, list):
-                            schema_types.extend([str(x) for x in t])
-                        else:
-                            schema_types.append(str(t))
-                    for v in obj.values():
-                        collect_types(v)
-                elif isinstance(obj, list):
-                    for v in obj:
-                        collect_types(v)
-            collect_types(data)
-        except Exception:
-            continue
+    schema_types = _schema_types(ld_json)
 
     # Issues
     issues = []